@@ -2,6 +2,8 @@
 import asyncio
 import json
 import logging
+from contextlib import AsyncExitStack
+from typing import Any, Dict
 from fastmcp import Client
 from fastmcp.exceptions import ClientError
 
@@ -21,115 +23,171 @@ SEARCH_PARAMS = {
     "max_price": 150000
 }
 
-async def check_server():
+# Exit stacks holding each session opened by connect(), keyed by its client
+_open_sessions: Dict[Client, AsyncExitStack] = {}
+
+
+async def connect(server: Any = SERVER_FILE) -> Client:
+    """
+    Starts the FastMCP server and opens a client session to it.
+    `server` is anything Client accepts, e.g. a server script path or a FastMCP instance.
+    The session stays open until disconnect() is called, so several checks
+    can share one server process instead of spawning a new one each time.
+
+    connect() and disconnect() must be awaited from the same task: the stdio
+    transport runs inside anyio cancel scopes, which have to be exited by the
+    task that entered them.
+    """
+    logger.info(f"Attempting to connect to server script: {server}")
+    async with AsyncExitStack() as stack:
+        # Create a client targeting the server file (implies stdio transport)
+        client = await stack.enter_async_context(Client(server))
+        _open_sessions[client] = stack.pop_all()
+    logger.info("Successfully connected to the server.")
+    return client
+
+
+async def disconnect(client: Client) -> None:
+    """
+    Closes a client session opened by connect() and stops the server process.
+    Must be awaited from the task that called connect().
     """
-    Connects to the FastMCP server, checks if the expected tool is available,
-    and attempts to call the tool with specific parameters.
+    stack = _open_sessions.pop(client)
+    await stack.aclose()
+
+
+async def run_checks(client: Client, tool_to_call: str = TOOL_TO_CALL, search_params: dict = SEARCH_PARAMS) -> bool:
+    """
+    Checks if the expected tool is available on a connected client and
+    attempts to call the tool with specific parameters.
+
+    Returns:
+        True if the tool was found and called successfully, False otherwise.
     """
-    logger.info(f"Attempting to connect to server script: {SERVER_FILE}")
     tool_found = False
     tool_call_successful = False
-    final_status = "FAILURE" # Default to failure
 
+    # --- Check 1: List Tools ---
+    logger.info("Listing available tools...")
     try:
-        # Create a client targeting the server file (implies stdio transport)
-        async with Client(SERVER_FILE) as client:
-            logger.info("Successfully connected to the server.")
-
-            # --- Check 1: List Tools ---
-            logger.info("Listing available tools...")
-            try:
-                tools = await client.list_tools()
-                tool_names = [tool.name for tool in tools]
-                logger.info(f"Found tools: {tool_names}")
-
-                if TOOL_TO_CALL in tool_names:
-                    logger.info(f"Expected tool '{TOOL_TO_CALL}' found.")
-                    tool_found = True
-                else:
-                    logger.error(f"FAILURE: Expected tool '{TOOL_TO_CALL}' NOT found.")
-                    print("\n--- Server Check Result: FAILURE ---")
-                    print(f"Connected to the server, but the expected tool '{TOOL_TO_CALL}' was not found.")
-                    print(f"Available tools: {tool_names}")
-                    return # Exit if tool not found
-
-            except ClientError as e:
-                logger.error(f"FAILURE: Error while listing tools: {e}")
-                print("\n--- Server Check Result: FAILURE ---")
-                print(f"Connected to the server, but failed to list tools: {e}")
-                return # Exit on listing error
-            except Exception as e:
-                 logger.error(f"FAILURE: An unexpected error occurred while listing tools: {e}", exc_info=True)
-                 print("\n--- Server Check Result: FAILURE ---")
-                 print(f"An unexpected error occurred: {e}")
-                 return # Exit on unexpected error
-
-            # --- Check 2: Call the Tool (if found) ---
-            if tool_found:
-                logger.info(f"Attempting to call tool '{TOOL_TO_CALL}' with params: {SEARCH_PARAMS}")
-                try:
-                    results = await client.call_tool(
-                        TOOL_TO_CALL,
-                        SEARCH_PARAMS
-                    )
-                    logger.info(f"Tool '{TOOL_TO_CALL}' executed.")
-                    tool_call_successful = True # Mark as successful if call doesn't raise ClientError
-
-                    # Process and print results
-                    if results:
-                        items_list_json = results[0].text
-                        items_list = json.loads(items_list_json)
-
-                        if items_list:
-                            logger.info(f"Tool call successful. Found {len(items_list)} items:")
-                            print("\n--- Mercari Search Results (First 10) ---")
-                            for item in items_list[:10]:
-                                print(f"- {item['name']} ({item['price']} JPY): {item['url']}")
-                            if len(items_list) > 10:
-                                print(f"... and {len(items_list) - 10} more.")
-                        else:
-                            logger.info("Tool call successful, but no items found matching the criteria.")
-                            print("\n--- Mercari Search Results ---")
-                            print("No items found matching the criteria.")
-                    else:
-                         logger.warning("Tool call successful, but returned no results content.")
-                         print("\n--- Mercari Search Results ---")
-                         print("Tool executed but returned no results.")
-
-                except ClientError as e:
-                    # This catches errors reported *by the tool* via MCP
-                    logger.error(f"FAILURE: Tool '{TOOL_TO_CALL}' reported an error: {e}")
-                    print("\n--- Server Check Result: FAILURE ---")
-                    print(f"The tool '{TOOL_TO_CALL}' executed but reported an error: {e}")
-                except Exception as e:
-                    # This catches other errors during the call (e.g., client-side issues)
-                    logger.error(f"FAILURE: An unexpected error occurred while calling tool '{TOOL_TO_CALL}': {e}", exc_info=True)
+        tools = await client.list_tools()
+        tool_names = [tool.name for tool in tools]
+        logger.info(f"Found tools: {tool_names}")
+
+        if tool_to_call in tool_names:
+            logger.info(f"Expected tool '{tool_to_call}' found.")
+            tool_found = True
+        else:
+            logger.error(f"FAILURE: Expected tool '{tool_to_call}' NOT found.")
+            print("\n--- Server Check Result: FAILURE ---")
+            print(f"Connected to the server, but the expected tool '{tool_to_call}' was not found.")
+            print(f"Available tools: {tool_names}")
+            return False # Exit if tool not found
+
+    except ClientError as e:
+        logger.error(f"FAILURE: Error while listing tools: {e}")
+        print("\n--- Server Check Result: FAILURE ---")
+        print(f"Connected to the server, but failed to list tools: {e}")
+        return False # Exit on listing error
+    except Exception as e:
+         logger.error(f"FAILURE: An unexpected error occurred while listing tools: {e}", exc_info=True)
+         print("\n--- Server Check Result: FAILURE ---")
+         print(f"An unexpected error occurred: {e}")
+         return False # Exit on unexpected error
+
+    # --- Check 2: Call the Tool (if found) ---
+    if tool_found:
+        logger.info(f"Attempting to call tool '{tool_to_call}' with params: {search_params}")
+        try:
+            results = await client.call_tool(
+                tool_to_call,
+                search_params
+            )
+            logger.info(f"Tool '{tool_to_call}' executed.")
+            tool_call_successful = True # Mark as successful if call doesn't raise ClientError
+
+            # Process and print results
+            if results:
+                items_json = results[0].text
+                # The tool returns compact parallel lists by default
+                items = json.loads(items_json)
+                if "error" in items:
+                    # Search failures come back as a structured result rather than a tool error
+                    logger.error(f"FAILURE: Tool '{tool_to_call}' returned an error: {items['error']}")
                     print("\n--- Server Check Result: FAILURE ---")
-                    print(f"An unexpected error occurred while calling the tool: {e}")
-
-            # --- Final Status ---
-            if tool_found and tool_call_successful:
-                final_status = "SUCCESS"
-                print("\n--- Server Check Result: SUCCESS ---")
-                print(f"The server is running, '{TOOL_TO_CALL}' tool is available and was called successfully.")
-            elif tool_found and not tool_call_successful:
-                # Already printed failure message in the except block
-                pass
-            # else: tool not found, already printed failure
+                    print(f"The tool '{tool_to_call}' executed but returned an error: {items['error']}")
+                    return False
+                items_list = list(zip(items["names"], items["prices"], items["urls"]))
+
+                if items_list:
+                    logger.info(f"Tool call successful. Found {len(items_list)} items:")
+                    print("\n--- Mercari Search Results (First 10) ---")
+                    for name, price, url in items_list[:10]:
+                        print(f"- {name} ({price} JPY): {url}")
+                    if len(items_list) > 10:
+                        print(f"... and {len(items_list) - 10} more.")
+                else:
+                    logger.info("Tool call successful, but no items found matching the criteria.")
+                    print("\n--- Mercari Search Results ---")
+                    print("No items found matching the criteria.")
+                if items.get("truncated"):
+                    print("Note: the scan cap was reached; more matches may exist further down the results.")
+            else:
+                 logger.warning("Tool call successful, but returned no results content.")
+                 print("\n--- Mercari Search Results ---")
+                 print("Tool executed but returned no results.")
+
+        except ClientError as e:
+            # This catches errors reported *by the tool* via MCP
+            logger.error(f"FAILURE: Tool '{tool_to_call}' reported an error: {e}")
+            print("\n--- Server Check Result: FAILURE ---")
+            print(f"The tool '{tool_to_call}' executed but reported an error: {e}")
+        except Exception as e:
+            # This catches other errors during the call (e.g., client-side issues)
+            logger.error(f"FAILURE: An unexpected error occurred while calling tool '{tool_to_call}': {e}", exc_info=True)
+            print("\n--- Server Check Result: FAILURE ---")
+            print(f"An unexpected error occurred while calling the tool: {e}")
+
+    # --- Final Status ---
+    if tool_found and tool_call_successful:
+        print("\n--- Server Check Result: SUCCESS ---")
+        print(f"The server is running, '{tool_to_call}' tool is available and was called successfully.")
+        return True
+    # else: failure message already printed in the except block
+    return False
 
 
+async def check_server():
+    """
+    One-shot check: connects to the FastMCP server, runs the checks once and disconnects.
+    """
+    try:
+        client = await connect(SERVER_FILE)
     except ConnectionRefusedError:
         logger.error(f"FAILURE: Connection refused. Is the server script ({SERVER_FILE}) running?")
         print("\n--- Server Check Result: FAILURE ---")
         print(f"Could not connect. Make sure '{SERVER_FILE}' is running in another terminal.")
+        return
     except FileNotFoundError:
          logger.error(f"FAILURE: Server script '{SERVER_FILE}' not found in the current directory.")
          print("\n--- Server Check Result: FAILURE ---")
          print(f"Server script '{SERVER_FILE}' not found. Make sure it's in the same directory or provide the correct path.")
+         return
     except Exception as e:
         logger.error(f"FAILURE: An unexpected error occurred during connection: {e}", exc_info=True)
         print("\n--- Server Check Result: FAILURE ---")
         print(f"An unexpected error occurred during connection: {e}")
+        return
+
+    try:
+        await run_checks(client)
+    finally:
+        try:
+            await disconnect(client)
+        except Exception as e:
+            logger.error(f"FAILURE: An unexpected error occurred while disconnecting: {e}", exc_info=True)
+            print("\n--- Server Check Result: FAILURE ---")
+            print(f"An unexpected error occurred while disconnecting: {e}")
 
 if __name__ == "__main__":
     asyncio.run(check_server())
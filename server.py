@@ -1,99 +1,501 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import orjson
 from mercari import (MercariOrder, MercariSearchStatus, MercariSort, search)
-from pydantic import Field
-from fastmcp import FastMCP
-
-mercari_mcp = FastMCP(name="MercariSearchComplete", dependencies=["mercari"])
-
-@mercari_mcp.tool(name="search_mercari_jp", 
-                description="""Search Mercari for items, excluding keywords and filtering by price and specific model name.
-                Args:
-                    keyword (str): The main keyword to search for (e.g., 'iPhone15 Pro 256GB'). Optimize this to ensure the product name is correct, sometimes it has to be in Japanese.
-                    exclude_keywords (str): Space-separated keywords to exclude. Think about exclude keywords that can make the search more precise. Generate this in japanese. For example, 'ジャンク', 'max', 'plus', '11', '12', '13', '14', '16', 'ケース', 'カバー', 'フィルム' when searching for iPhone15 Pro 256GB. Don't forget to separate them with space. Do not include '新品', '未使用', or '中古' in this list if not requested.
-                    min_price (int, optional): Minimum price in JPY. Think about the minimum price that you are willing to pay for the item. For example, if you are looking for a new iPhone15 Pro 256GB, you might want to set a minimum price of 100000 JPY.
-                    max_price (int, optional): Maximum price in JPY. Think about the maximum price that you are willing to pay for the item. For example, if you are looking for a new iPhone15 Pro 256GB, you might want to set a maximum price of 200000 JPY.
-                    limit (int): Maximum number of items to return.""")
-def search_mercari_items_filtered(
-    keyword: str = Field(..., description="The main keyword to search for (e.g., 'iPhone15 Pro 256GB')."),
-    exclude_keywords: str = Field("", description="Space-separated keywords to exclude (e.g., 'ジャンク max')."),
-    min_price: Optional[int] = Field(None, description="Minimum price in JPY.", ge=0),
-    max_price: Optional[int] = Field(None, description="Maximum price in JPY.", ge=0),
-    limit: int = Field(20, description="Maximum number of items to return.", ge=1)
-) -> List[Dict[str, Any]]:
+from pydantic import BaseModel, Field
+from fastmcp import Context, FastMCP
+from mcp.types import ProgressToken, TextContent
+
+# stdout carries the MCP stdio protocol, so diagnostics must go through logging, never print().
+logger = logging.getLogger("mercari_mcp")
+
+
+def _serialize_tool_result(data: Any) -> str:
+    """Serializes tool results with orjson; falls back to str() for values it cannot encode."""
+    return orjson.dumps(data, default=str).decode()
+
+
+def _serialized(data: Any) -> TextContent:
     """
-    Performs a search on Mercari Japan using a keyword, excluding specified keywords,
-    and filtering results by the provided price range.
-    Additionally filters results based on keywords derived from the input keyword
-    and exclude_keywords to ensure the product name closely matches the desired model.
-    Uses default sorting (price ascending) and only shows items on sale.
+    Pre-serializes a result as TextContent. FastMCP only applies `tool_serializer` to non-list
+    results (lists fall back to its indented default serializer), so list payloads go through here.
+    """
+    return TextContent(type="text", text=_serialize_tool_result(data))
 
-    Returns:
-        A list of dictionaries for items matching all criteria, limited to the specified number.
-        Returns an empty list if no items are found or an error occurs.
+
+mercari_mcp = FastMCP(
+    name="MercariSearchComplete",
+    dependencies=["mercari", "orjson"],
+    tool_serializer=_serialize_tool_result,
+)
+
+SEARCH_CACHE_TTL_SECONDS = 120
+SEARCH_CACHE_MAX_ENTRIES = 128
+# mercari.search fetches 120 items per page; stop after this many pages' worth of results.
+MAX_SCANNED_ITEMS = 5 * 120
+
+
+class _CachedSearch:
     """
-    try:
-        search_results = search(
+    Replayable view over a lazy `mercari.search` generator.
+
+    The upstream generator keeps paging until Mercari runs out of results, so it is
+    never materialized up front. Items are pulled on demand and remembered, letting
+    later iterations replay them and only hit the network for pages not yet fetched.
+    If the upstream search fails, the error is kept and re-raised to every iterator that
+    reaches the end of the fetched items, so a failure is never mistaken for the end of results.
+    """
+
+    def __init__(self, results: Iterator[Any]):
+        self._results: Optional[Iterator[Any]] = results
+        self._items: List[Any] = []
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self.created_at = time.monotonic()
+
+    def __iter__(self) -> Iterator[Any]:
+        index = 0
+        while True:
+            with self._lock:
+                if index == len(self._items):
+                    if self._error is not None:
+                        raise self._error
+                    if self._results is None:
+                        return
+                    try:
+                        self._items.append(next(self._results))
+                    except StopIteration:
+                        self._results = None
+                        return
+                    except Exception as e:
+                        self._error = e
+                        self._results = None
+                        raise
+                item = self._items[index]
+            yield item
+            index += 1
+
+
+_search_cache: "OrderedDict[Tuple[str, str], _CachedSearch]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+def _cached_search(keyword: str, exclude_keywords: str) -> _CachedSearch:
+    """
+    Returns the cached Mercari search for (keyword, exclude_keywords), starting a new one
+    if there is none or it is older than SEARCH_CACHE_TTL_SECONDS.
+    Price and limit are applied locally, so refining them reuses the same upstream results.
+    """
+    key = (keyword, exclude_keywords)
+    now = time.monotonic()
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is not None and now - entry.created_at < SEARCH_CACHE_TTL_SECONDS:
+            _search_cache.move_to_end(key)
+            return entry
+        entry = _CachedSearch(search(
             keyword,
             sort=MercariSort.SORT_SCORE,
             order=MercariOrder.ORDER_DESC,
             status=MercariSearchStatus.ON_SALE,
             exclude_keywords=exclude_keywords
-        )
+        ))
+        _search_cache[key] = entry
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            _search_cache.popitem(last=False)
+        return entry
 
-        items_found: List[Dict[str, Any]] = []
-        required_terms = [term.lower() for term in keyword.split()]
-        unwanted_terms_from_input = [term.lower() for term in exclude_keywords.split()]
-        all_unwanted_terms = list(set(unwanted_terms_from_input))
-        all_unwanted_terms = [term for term in all_unwanted_terms if term not in required_terms]
 
+def _invalidate_cached_search(keyword: str, exclude_keywords: str) -> None:
+    """Drops the cached search for (keyword, exclude_keywords), e.g. after an upstream error."""
+    with _search_cache_lock:
+        _search_cache.pop((keyword, exclude_keywords), None)
+
+
+# Full-width spaces (U+3000) are common in Japanese input, so they are spelled out explicitly.
+_TERM_SEPARATOR = re.compile(r"[\s\u3000]+")
+
+
+def _split_terms(text: str) -> Tuple[str, ...]:
+    """Splits space-separated keywords into casefolded, interned terms, dropping empty ones."""
+    return tuple(sys.intern(term) for term in _TERM_SEPARATOR.split(text.casefold()) if term)
+
+
+@lru_cache(maxsize=128)
+def _term_patterns(
+    required_terms: Tuple[str, ...], unwanted_terms: FrozenSet[str]
+) -> Tuple["re.Pattern[str]", "Optional[re.Pattern[str]]"]:
+    """Compiles the matchers for a set of casefolded required and unwanted terms."""
+    # One lookahead per required term so overlapping terms (e.g. '15' and 'iphone15')
+    # are each checked independently, all within a single C-level match.
+    required_pattern = re.compile(
+        "".join(f"(?=.*?{re.escape(term)})" for term in required_terms), re.DOTALL
+    )
+    unwanted_pattern = (
+        re.compile("|".join(re.escape(term) for term in unwanted_terms))
+        if unwanted_terms else None
+    )
+    return required_pattern, unwanted_pattern
+
+
+@lru_cache(maxsize=4096)
+def _name_matches_terms(
+    product_name: str, required_terms: Tuple[str, ...], unwanted_terms: FrozenSet[str]
+) -> bool:
+    """
+    Whether a product name contains every required term and none of the unwanted ones.
+    Memoized because the same listings keep coming back while an agent refines a query.
+    """
+    required_pattern, unwanted_pattern = _term_patterns(required_terms, unwanted_terms)
+    lower_product_name = product_name.casefold()
+    return required_pattern.match(lower_product_name) is not None and not (
+        unwanted_pattern is not None and unwanted_pattern.search(lower_product_name) is not None
+    )
+
+
+def _iter_filtered_items(
+    search_results: Iterable[Any],
+    required_terms: Tuple[str, ...],
+    unwanted_terms: FrozenSet[str],
+    min_price: Optional[int],
+    max_price: Optional[int],
+) -> Iterator[Dict[str, Any]]:
+    """Yields a dictionary for each search result whose name and price pass the filters."""
+    lowest_price = min_price if min_price is not None else float("-inf")
+    highest_price = max_price if max_price is not None else float("inf")
+    for item in search_results:
+        try:
+            # The price check is a cheap numeric comparison, so it runs before any name matching.
+            try:
+                price = float(item.price)
+            except (AttributeError, ValueError, TypeError):
+                continue
+            if not (lowest_price <= price <= highest_price):
+                continue
 
-        for item in search_results:
             try:
-                product_name = getattr(item, 'productName', None)
-                if product_name is None:
-                    continue
-
-                price = getattr(item, 'price', None)
-                if price is None:
-                    continue
-                try:
-                    price = float(price)
-                except (ValueError, TypeError):
-                    continue
-
-                lower_product_name = product_name.lower()
-                name_contains_desired_keywords = all(
-                    term in lower_product_name for term in required_terms
-                )
-                name_contains_unwanted_terms = any(
-                    term in lower_product_name for term in all_unwanted_terms
-                )
-
-                if name_contains_desired_keywords and not name_contains_unwanted_terms:
-                    min_check_passed = (min_price is None) or (price >= min_price)
-                    max_check_passed = (max_price is None) or (price <= max_price)
-
-                    if min_check_passed and max_check_passed:
-                        items_found.append({
-                            "name": product_name,
-                            "url": getattr(item, 'productURL', 'N/A'),
-                            "price": price,
-                        })
-
-                        if len(items_found) >= limit:
-                            break
-
-            except (AttributeError) as filter_err:
-                print(f"Warning: Skipping item during post-filtering due to data access error: {filter_err}")
+                product_name = item.productName
+                product_url = item.productURL
+            except AttributeError:
                 continue
-            except Exception as unexpected_err:
-                print(f"Warning: Skipping item due to unexpected error during filtering: {unexpected_err}")
+            if product_name is None:
                 continue
-        return items_found
 
+            if _name_matches_terms(product_name, required_terms, unwanted_terms):
+                yield {
+                    "name": product_name,
+                    "url": product_url,
+                    "price": price,
+                }
+
+        except (AttributeError) as filter_err:
+            logger.debug("Skipping item during post-filtering due to data access error: %s", filter_err)
+            continue
+        except Exception as unexpected_err:
+            logger.debug("Skipping item due to unexpected error during filtering: %s", unexpected_err)
+            continue
+
+
+class _FilteredItems(NamedTuple):
+    items: List[Dict[str, Any]]
+    # True when the scan stopped at MAX_SCANNED_ITEMS before `limit` matches were found.
+    truncated: bool
+
+
+def _collect_filtered_items(
+    search_results: Iterable[Any],
+    required_terms: Tuple[str, ...],
+    unwanted_terms: FrozenSet[str],
+    min_price: Optional[int],
+    max_price: Optional[int],
+    limit: int,
+    on_match: Optional[Callable[[int], None]] = None,
+) -> _FilteredItems:
+    """
+    Keeps the first `limit` search results that pass the filters, stopping as soon as they are found.
+    Iterating may fetch further result pages over the network, so this is run off the event loop.
+    At most MAX_SCANNED_ITEMS upstream results are examined, so a very selective filter cannot
+    page through (and cache) an entire Mercari category; the result says whether that cap was hit.
+    If given, `on_match` is called with the running count each time an item is kept.
+    """
+    scanned_count = 0
+
+    def scanned() -> Iterator[Any]:
+        nonlocal scanned_count
+        for item in itertools.islice(search_results, MAX_SCANNED_ITEMS):
+            scanned_count += 1
+            yield item
+
+    filtered = _iter_filtered_items(scanned(), required_terms, unwanted_terms, min_price, max_price)
+    items_found: List[Dict[str, Any]] = []
+    for item in itertools.islice(filtered, limit):
+        items_found.append(item)
+        if on_match is not None:
+            on_match(len(items_found))
+    truncated = len(items_found) < limit and scanned_count >= MAX_SCANNED_ITEMS
+    return _FilteredItems(items_found, truncated)
+
+
+def _error_message(error: BaseException) -> str:
+    """Short description of a failed search for tool results; the traceback only goes to the log."""
+    return f"{type(error).__name__}: {error}"
+
+
+def _to_columns(items: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Converts a list of item dictionaries into parallel lists, so each key is serialized once."""
+    return {
+        "names": [item["name"] for item in items],
+        "urls": [item["url"] for item in items],
+        "prices": [item["price"] for item in items],
+    }
+
+
+def _format_items(items: List[Dict[str, Any]], compact: bool) -> Dict[str, Any]:
+    """The search_mercari_jp payload: parallel lists when compact, otherwise {"items": [...]}."""
+    return _to_columns(items) if compact else {"items": items}
+
+
+_inflight_searches: Dict[Tuple[Any, ...], "asyncio.Task[_FilteredItems]"] = {}
+
+
+async def _search_one(
+    keyword: str,
+    exclude_keywords: str = "",
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    limit: int = 20,
+    ctx: Optional[Context] = None,
+) -> _FilteredItems:
+    """
+    Runs a single filtered Mercari search. Shared by the single and batch search tools
+    so both go through the same upstream cache.
+    Identical searches that arrive while one is still running wait for its result instead
+    of starting their own; only the first caller's `ctx` receives progress notifications,
+    and only while that caller is still waiting.
+    """
+    key = (keyword, exclude_keywords, min_price, max_price, limit)
+    task = _inflight_searches.get(key)
+    first_caller_cancelled: Optional[asyncio.Event] = None
+    if task is None:
+        first_caller_cancelled = asyncio.Event()
+        # The search runs in its own task owned by the map, so it outlives any one caller.
+        task = asyncio.ensure_future(
+            _run_search(keyword, exclude_keywords, min_price, max_price, limit, ctx, first_caller_cancelled)
+        )
+        _inflight_searches[key] = task
+        task.add_done_callback(lambda done: _forget_inflight_search(key, done))
+    try:
+        # Every caller, the first included, is shielded: cancelling one request must not cancel
+        # the search the other coalesced requests are waiting on.
+        result = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if first_caller_cancelled is not None:
+            # The request the progress notifications belong to is gone.
+            first_caller_cancelled.set()
+        raise
+    return _FilteredItems(list(result.items), result.truncated)
+
+
+def _forget_inflight_search(key: Tuple[Any, ...], task: "asyncio.Task[_FilteredItems]") -> None:
+    """Done-callback removing a finished search from the in-flight map."""
+    if _inflight_searches.get(key) is task:
+        del _inflight_searches[key]
+    # Mark the exception as retrieved even when every caller was cancelled before it finished.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _run_search(
+    keyword: str,
+    exclude_keywords: str,
+    min_price: Optional[int],
+    max_price: Optional[int],
+    limit: int,
+    ctx: Optional[Context],
+    caller_cancelled: asyncio.Event,
+) -> _FilteredItems:
+    """
+    Performs the filtered search behind _search_one.
+    If the request in `ctx` carries a progressToken, a progress notification (items found
+    so far out of `limit`) is sent as each matching item is found, until `caller_cancelled` is set.
+    """
+    try:
+        search_results = _cached_search(keyword, exclude_keywords)
+
+        required_terms = _split_terms(keyword)
+        all_unwanted_terms = frozenset(_split_terms(exclude_keywords)) - frozenset(required_terms)
+
+        on_match: Optional[Callable[[int], None]] = None
+        progress_token = _progress_token(ctx)
+        if progress_token is not None:
+            session = ctx.request_context.session
+            loop = asyncio.get_running_loop()
+
+            async def send_progress(found: int) -> None:
+                if not caller_cancelled.is_set():
+                    await session.send_progress_notification(progress_token=progress_token, progress=found, total=limit)
+
+            def on_match(found: int) -> None:
+                # Called from the worker thread; the notification is sent on the event loop.
+                future = asyncio.run_coroutine_threadsafe(send_progress(found), loop)
+                future.add_done_callback(_log_progress_failure)
+
+        return await asyncio.to_thread(
+            _collect_filtered_items,
+            search_results, required_terms, all_unwanted_terms, min_price, max_price, limit, on_match
+        )
+
+    except Exception as e:
+        _invalidate_cached_search(keyword, exclude_keywords)
+        logger.exception("An error occurred during Mercari search: %s", e)
+        raise
+
+
+def _progress_token(ctx: Optional[Context]) -> Optional[ProgressToken]:
+    """Returns the progressToken of the request behind `ctx`, or None if the client did not send one."""
+    if ctx is None:
+        return None
+    try:
+        meta = ctx.request_context.meta
+    except ValueError:
+        # The tool was called directly rather than through an MCP request.
+        return None
+    return meta.progressToken if meta is not None else None
+
+
+def _log_progress_failure(future: "concurrent.futures.Future[None]") -> None:
+    """Done-callback logging a progress notification that could not be sent."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.debug("Failed to send a progress notification: %s", future.exception())
+
+
+# Argument guidance lives only in the parameter schemas; repeating it in the tool descriptions
+# would send it to the client twice in every tool listing.
+KEYWORD_DESCRIPTION = (
+    "The main keyword to search for (e.g., 'iPhone15 Pro 256GB'). Optimize this to ensure the product name is "
+    "correct, sometimes it has to be in Japanese."
+)
+EXCLUDE_KEYWORDS_DESCRIPTION = (
+    "Space-separated keywords to exclude. Think about exclude keywords that can make the search more precise. "
+    "Generate this in japanese. For example, 'ジャンク', 'max', 'plus', '11', '12', '13', '14', '16', 'ケース', 'カバー', "
+    "'フィルム' when searching for iPhone15 Pro 256GB. Don't forget to separate them with space. Do not include '新品', "
+    "'未使用', or '中古' in this list if not requested."
+)
+MIN_PRICE_DESCRIPTION = (
+    "Minimum price in JPY. Think about the minimum price that you are willing to pay for the item. For example, if "
+    "you are looking for a new iPhone15 Pro 256GB, you might want to set a minimum price of 100000 JPY."
+)
+MAX_PRICE_DESCRIPTION = (
+    "Maximum price in JPY. Think about the maximum price that you are willing to pay for the item. For example, if "
+    "you are looking for a new iPhone15 Pro 256GB, you might want to set a maximum price of 200000 JPY."
+)
+LIMIT_DESCRIPTION = (
+    f"Maximum number of items to return. At most {MAX_SCANNED_ITEMS} listings are scanned per search; if that cap "
+    'stops the scan before enough matches are found, the result has "truncated": true and more matches may exist '
+    "further down Mercari's results. Narrow the keyword or price range rather than raising the limit in that case."
+)
+COMPACT_DESCRIPTION = (
+    'Return items as parallel lists {"names": [...], "urls": [...], "prices": [...]} (default), or as '
+    '{"items": [{"name", "url", "price"}, ...]} when false. Either shape gains an "error" key if the search fails.'
+)
+
+
+@mercari_mcp.tool(name="search_mercari_jp",
+                description="Search Mercari for items, excluding keywords and filtering by price and specific model name.")
+async def search_mercari_items_filtered(
+    keyword: str = Field(..., description=KEYWORD_DESCRIPTION),
+    exclude_keywords: str = Field("", description=EXCLUDE_KEYWORDS_DESCRIPTION),
+    min_price: Optional[int] = Field(None, description=MIN_PRICE_DESCRIPTION, ge=0),
+    max_price: Optional[int] = Field(None, description=MAX_PRICE_DESCRIPTION, ge=0),
+    limit: int = Field(20, description=LIMIT_DESCRIPTION, ge=1),
+    compact: bool = Field(True, description=COMPACT_DESCRIPTION),
+    ctx: Context = None
+) -> Dict[str, Any]:
+    """
+    Performs a search on Mercari Japan using a keyword, excluding specified keywords,
+    and filtering results by the provided price range.
+    Additionally filters results based on keywords derived from the input keyword
+    and exclude_keywords to ensure the product name closely matches the desired model.
+    Uses default sorting (price ascending) and only shows items on sale.
+    Upstream results are cached per (keyword, exclude_keywords) for a short time.
+
+    Returns:
+        A dictionary with the items matching all criteria, limited to the specified number,
+        either as parallel "names"/"urls"/"prices" lists (compact) or as an "items" list of
+        dictionaries, plus "truncated" (True when the MAX_SCANNED_ITEMS cap stopped the scan
+        before `limit` matches were found). The lists are empty if nothing is found. If the search fails, the same
+        shape is returned with empty lists plus an "error" message instead of raising, so a
+        failed call does not turn into a tool error the agent has to recover from.
+    """
+    try:
+        result = await _search_one(keyword, exclude_keywords, min_price, max_price, limit, ctx)
     except Exception as e:
-        print(f"Error: An error occurred during Mercari search: {e}")
-        raise e
+        return {**_format_items([], compact), "truncated": False, "error": _error_message(e)}
+    return {**_format_items(result.items, compact), "truncated": result.truncated}
+
+
+MAX_BATCH_QUERIES = 10
+
+
+# One query of a batch search. Its field guidance is kept short (and the class has no docstring,
+# which pydantic would publish in the schema) because the batch tool points the agent at
+# search_mercari_jp, whose schema already carries the full descriptions.
+class SearchQuery(BaseModel):
+    keyword: str = Field(..., description="The main keyword to search for (e.g., 'iPhone15 Pro 256GB').")
+    exclude_keywords: str = Field("", description="Space-separated keywords to exclude (e.g., 'ジャンク max').")
+    min_price: Optional[int] = Field(None, description="Minimum price in JPY.", ge=0)
+    max_price: Optional[int] = Field(None, description="Maximum price in JPY.", ge=0)
+    limit: int = Field(20, description=LIMIT_DESCRIPTION, ge=1)
+    compact: bool = Field(True, description="Return parallel names/urls/prices lists instead of one object per item.")
+
+
+@mercari_mcp.tool(name="batch_search_mercari_jp",
+                description="Run several Mercari searches concurrently in one call, each taking the same fields as search_mercari_jp. "
+                            "Use this instead of calling search_mercari_jp repeatedly, e.g. to compare models, storage sizes or keyword variants.")
+async def batch_search_mercari_items_filtered(
+    queries: List[SearchQuery] = Field(
+        ..., description=f"Up to {MAX_BATCH_QUERIES} searches to run.", min_length=1, max_length=MAX_BATCH_QUERIES
+    )
+) -> TextContent:
+    """
+    Runs each query like search_mercari_jp, concurrently.
+    An item already returned for an earlier query is left out of later queries' results.
+
+    Returns:
+        One dictionary per query, in order, with the query, its items, whether the scan was
+        truncated and, if that search failed, an error message.
+    """
+    results = await asyncio.gather(
+        *(_search_one(**query.model_dump(exclude={"compact"})) for query in queries),
+        return_exceptions=True
+    )
+
+    batch_results: List[Dict[str, Any]] = []
+    seen_urls = set()
+    for query, result in zip(queries, results):
+        entry: Dict[str, Any] = {"query": query.model_dump()}
+        if isinstance(result, BaseException):
+            entry["items"] = _to_columns([]) if query.compact else []
+            entry["truncated"] = False
+            entry["error"] = _error_message(result)
+        else:
+            items_found = [item for item in result.items if item["url"] not in seen_urls]
+            seen_urls.update(item["url"] for item in items_found)
+            entry["items"] = _to_columns(items_found) if query.compact else items_found
+            entry["truncated"] = result.truncated
+        batch_results.append(entry)
+    return _serialized(batch_results)
+
 
 if __name__ == "__main__":
     mercari_mcp.run()
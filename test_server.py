@@ -0,0 +1,448 @@
+# test_server.py
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastmcp import Client
+from mcp import types as mcp_types
+
+import check_server
+import server
+
+
+class FakeItem:
+    def __init__(self, index, name="iPhone15 Pro 256GB", price=100000):
+        self.productName = name
+        self.price = price + index
+        self.productURL = f"https://jp.mercari.com/item/m{index}"
+
+
+class FakeSearch:
+    """Stands in for mercari.search, recording calls and optionally failing part-way."""
+
+    def __init__(self, count=50, fail_at=None, gate=None):
+        self.count = count
+        self.fail_at = fail_at
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, keyword, sort=None, order=None, status=None, exclude_keywords=""):
+        self.calls.append((keyword, exclude_keywords))
+        return self._results()
+
+    def _results(self):
+        if self.gate is not None:
+            self.gate.wait()
+        for index in range(self.count):
+            if index == self.fail_at:
+                raise ConnectionError("upstream went away")
+            yield FakeItem(index)
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    def install(**kwargs):
+        fake = FakeSearch(**kwargs)
+        monkeypatch.setattr(server, "search", fake)
+        return fake
+
+    server._search_cache.clear()
+    server._name_matches_terms.cache_clear()
+    yield install
+    server._search_cache.clear()
+
+
+def call_tool(keyword="iPhone15 Pro", limit=20, compact=True, **kwargs):
+    return server.search_mercari_items_filtered(
+        keyword=keyword,
+        exclude_keywords=kwargs.get("exclude_keywords", ""),
+        min_price=kwargs.get("min_price"),
+        max_price=kwargs.get("max_price"),
+        limit=limit,
+        compact=compact,
+        ctx=None,
+    )
+
+
+def test_repeated_search_reuses_cached_upstream_results(fake_search):
+    fake = fake_search()
+
+    async def run():
+        first = await call_tool(limit=5)
+        refined = await call_tool(limit=3, min_price=100010)
+        return first, refined
+
+    first, refined = asyncio.run(run())
+
+    assert len(fake.calls) == 1
+    assert len(first["names"]) == 5
+    assert refined["prices"] == [100010.0, 100011.0, 100012.0]
+
+
+def test_cache_entry_expires_after_ttl(fake_search, monkeypatch):
+    fake = fake_search()
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+
+    server._cached_search("iPhone15 Pro", "")
+    now[0] += server.SEARCH_CACHE_TTL_SECONDS - 1
+    server._cached_search("iPhone15 Pro", "")
+    assert len(fake.calls) == 1
+
+    now[0] += 1
+    server._cached_search("iPhone15 Pro", "")
+    assert len(fake.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted(fake_search, monkeypatch):
+    fake_search()
+    monkeypatch.setattr(server, "SEARCH_CACHE_MAX_ENTRIES", 2)
+
+    server._cached_search("a", "")
+    server._cached_search("b", "")
+    server._cached_search("a", "")
+    server._cached_search("c", "")
+
+    assert list(server._search_cache) == [("a", ""), ("c", "")]
+
+
+def test_upstream_error_is_raised_to_every_iterator(fake_search):
+    fake_search(fail_at=10)
+    entry = server._cached_search("iPhone15 Pro", "")
+
+    first = iter(entry)
+    assert len([next(first) for _ in range(10)]) == 10
+    with pytest.raises(ConnectionError):
+        next(first)
+
+    second = iter(entry)
+    assert len([next(second) for _ in range(10)]) == 10
+    with pytest.raises(ConnectionError):
+        next(second)
+
+
+def test_concurrent_searches_sharing_a_failed_entry_all_report_the_error(fake_search):
+    gate = threading.Event()
+    fake_search(fail_at=10, gate=gate)
+
+    async def run():
+        searches = asyncio.gather(call_tool(limit=20), call_tool(limit=30))
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await searches
+
+    results = asyncio.run(run())
+
+    assert all(result["error"].startswith("ConnectionError") for result in results)
+    assert server._search_cache == {}
+
+
+def test_list_results_are_serialized_with_orjson(fake_search):
+    fake_search()
+
+    async def run():
+        async with Client(server.mercari_mcp) as client:
+            single = await client.call_tool("search_mercari_jp", {"keyword": "iPhone15 Pro", "limit": 2, "compact": False})
+            batch = await client.call_tool("batch_search_mercari_jp", {"queries": [{"keyword": "iPhone15 Pro", "limit": 2}]})
+            return single, batch
+
+    single, batch = asyncio.run(run())
+
+    for content in (single, batch):
+        assert len(content) == 1
+        assert "\n" not in content[0].text
+    assert json.loads(single[0].text)["items"][0]["name"] == "iPhone15 Pro 256GB"
+    assert json.loads(batch[0].text)[0]["items"]["names"] == ["iPhone15 Pro 256GB", "iPhone15 Pro 256GB"]
+
+
+def test_progress_is_reported_when_the_request_has_a_progress_token(fake_search):
+    fake_search()
+    progress = []
+
+    async def on_message(message):
+        if isinstance(message, mcp_types.ServerNotification) and isinstance(message.root, mcp_types.ProgressNotification):
+            progress.append((message.root.params.progressToken, message.root.params.progress, message.root.params.total))
+
+    async def run():
+        async with Client(server.mercari_mcp, message_handler=on_message) as client:
+            request = mcp_types.ClientRequest(mcp_types.CallToolRequest(
+                method="tools/call",
+                params=mcp_types.CallToolRequestParams(
+                    name="search_mercari_jp",
+                    arguments={"keyword": "iPhone15 Pro", "limit": 3},
+                    _meta=mcp_types.RequestParams.Meta(progressToken="search-1"),
+                ),
+            ))
+            result = await client.session.send_request(request, mcp_types.CallToolResult)
+            await client.call_tool("search_mercari_jp", {"keyword": "iPhone15 Pro", "limit": 2})
+            return result
+
+    result = asyncio.run(run())
+
+    assert not result.isError
+    assert progress == [("search-1", 1, 3), ("search-1", 2, 3), ("search-1", 3, 3)]
+
+def test_scan_stops_after_max_scanned_items(fake_search):
+    fake_search(count=server.MAX_SCANNED_ITEMS + 10)
+    past_the_cap = 100000 + server.MAX_SCANNED_ITEMS
+
+    result = asyncio.run(call_tool(min_price=past_the_cap))
+
+    assert result["names"] == []
+    assert result["truncated"] is True
+
+
+def test_search_is_not_truncated_when_results_run_out_or_limit_is_met(fake_search):
+    fake_search(count=30)
+
+    exhausted = asyncio.run(call_tool(limit=50))
+    filled = asyncio.run(call_tool(limit=5))
+
+    assert len(exhausted["names"]) == 30 and exhausted["truncated"] is False
+    assert len(filled["names"]) == 5 and filled["truncated"] is False
+
+
+def test_batch_entries_report_truncation(fake_search):
+    fake_search(count=server.MAX_SCANNED_ITEMS + 10)
+    queries = [
+        server.SearchQuery(keyword="iPhone15 Pro", limit=2),
+        server.SearchQuery(keyword="iPhone15 Pro", min_price=100000 + server.MAX_SCANNED_ITEMS),
+    ]
+
+    content = asyncio.run(server.batch_search_mercari_items_filtered(queries=queries))
+
+    assert [entry["truncated"] for entry in json.loads(content.text)] == [False, True]
+
+
+def test_failed_search_keeps_the_result_shape(fake_search):
+    fake_search(fail_at=0)
+
+    compact = asyncio.run(call_tool())
+    expanded = asyncio.run(call_tool(compact=False))
+
+    assert compact["names"] == compact["urls"] == compact["prices"] == []
+    assert compact["error"].startswith("ConnectionError")
+    assert expanded["items"] == []
+    assert expanded["error"].startswith("ConnectionError")
+
+
+def test_expanded_result_has_the_same_shape_on_success(fake_search):
+    fake_search()
+
+    result = asyncio.run(call_tool(limit=2, compact=False))
+
+    assert set(result) == {"items", "truncated"}
+    assert [item["price"] for item in result["items"]] == [100000.0, 100001.0]
+
+
+def test_identical_concurrent_searches_are_coalesced(fake_search):
+    fake = fake_search()
+    run_calls = []
+    run_search = server._run_search
+
+    async def counting_run_search(*args):
+        run_calls.append(args)
+        return await run_search(*args)
+
+    async def run():
+        return await asyncio.gather(*(server._search_one("iPhone15 Pro", limit=5) for _ in range(5)))
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(server, "_run_search", counting_run_search)
+        results = asyncio.run(run())
+
+    assert len(run_calls) == 1
+    assert len(fake.calls) == 1
+    assert all(result == results[0] and len(result.items) == 5 for result in results)
+    assert server._inflight_searches == {}
+
+
+def test_cancelling_the_first_caller_does_not_fail_coalesced_waiters(fake_search):
+    gate = threading.Event()
+    fake_search(gate=gate)
+
+    async def run():
+        first = asyncio.ensure_future(server._search_one("iPhone15 Pro", limit=5))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(server._search_one("iPhone15 Pro", limit=5))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    result = asyncio.run(run())
+
+    assert len(result.items) == 5
+    assert server._inflight_searches == {}
+
+
+def test_progress_stops_once_the_first_caller_is_cancelled(fake_search):
+    gate = threading.Event()
+    fake_search(gate=gate)
+    sent = []
+
+    class FakeSession:
+        async def send_progress_notification(self, progress_token, progress, total=None):
+            sent.append(progress)
+
+    ctx = SimpleNamespace(request_context=SimpleNamespace(
+        meta=mcp_types.RequestParams.Meta(progressToken="search-1"), session=FakeSession(),
+    ))
+
+    async def run():
+        first = asyncio.ensure_future(server._search_one("iPhone15 Pro", limit=5, ctx=ctx))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(server._search_one("iPhone15 Pro", limit=5))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        result = await second
+        await asyncio.sleep(0.01)
+        return result
+
+    result = asyncio.run(run())
+
+    assert len(result.items) == 5
+    assert sent == []
+
+@pytest.mark.parametrize(
+    ("name", "keyword", "exclude_keywords", "expected"),
+    [
+        # Overlapping required terms are each checked on their own.
+        ("iPhone15 Pro", "15 iphone15", "", True),
+        ("iPhone 15 Pro", "15 iphone15", "", False),
+        # Every required term must appear, in any order.
+        ("Pro 256GB iPhone15", "iphone15 pro 256gb", "", True),
+        ("iPhone15 128GB", "iphone15 pro", "", False),
+        # Any unwanted term rejects the name.
+        ("iPhone15 Pro Max", "iphone15 pro", "max plus", False),
+        ("iPhone15 Pro ジャンク", "iphone15 pro", "ケース ジャンク", False),
+        # Unwanted terms that are also required are ignored.
+        ("iPhone15 Pro", "iphone15 pro", "pro max", True),
+        # Regex metacharacters in terms are matched literally.
+        ("Sony α7 (IV) body", "(iv)", "", True),
+        ("Sony α7 IV body", "(iv)", "", False),
+        ("Switch OLED", "switch", "a.b oled+", True),
+        ("Switch a.b", "switch", "a.b", False),
+        ("Switch axb", "switch", "a.b", True),
+        # Names and terms are compared casefolded.
+        ("STRASSE Sneaker", "straße", "", True),
+        ("IPHONE15 PRO", "iPhone15 Pro", "", True),
+    ],
+)
+def test_name_matching(name, keyword, exclude_keywords, expected):
+    required_terms = server._split_terms(keyword)
+    unwanted_terms = frozenset(server._split_terms(exclude_keywords)) - frozenset(required_terms)
+
+    assert server._name_matches_terms(name, required_terms, unwanted_terms) is expected
+
+
+def test_tool_filters_names_by_required_and_unwanted_terms(fake_search, monkeypatch):
+    names = ["iPhone15 Pro 256GB", "iPhone15 Pro Max 256GB", "iPhone 15 Pro 256GB", "iphone15 pro 256gb ジャンク"]
+
+    def search(keyword, sort=None, order=None, status=None, exclude_keywords=""):
+        return (FakeItem(index, name=name) for index, name in enumerate(names))
+
+    monkeypatch.setattr(server, "search", search)
+
+    result = asyncio.run(call_tool(keyword="iPhone15 Pro", exclude_keywords="max ジャンク pro"))
+
+    assert result["names"] == ["iPhone15 Pro 256GB"]
+
+
+class ItemWithoutURL:
+    productName = "iPhone15 Pro 256GB"
+    price = 100000
+
+
+def test_items_missing_an_attribute_are_skipped(fake_search, monkeypatch):
+    def search(keyword, sort=None, order=None, status=None, exclude_keywords=""):
+        return iter([ItemWithoutURL(), FakeItem(1)])
+
+    monkeypatch.setattr(server, "search", search)
+
+    result = asyncio.run(call_tool())
+
+    assert result["urls"] == ["https://jp.mercari.com/item/m1"]
+
+
+class ItemWithBadName:
+    productName = 12345
+    productURL = "https://jp.mercari.com/item/bad"
+
+    def __init__(self, price):
+        self.price = price
+
+
+def test_price_is_checked_before_the_name_is_matched(fake_search, monkeypatch, caplog):
+    matched_names = []
+    name_matches_terms = server._name_matches_terms
+
+    def recording_name_matches_terms(product_name, *args):
+        matched_names.append(product_name)
+        return name_matches_terms(product_name, *args)
+
+    def search(keyword, sort=None, order=None, status=None, exclude_keywords=""):
+        return iter([
+            FakeItem(0, name="too cheap iPhone15 Pro", price=1000),
+            ItemWithBadName(price=1000),
+            FakeItem(0, name="iPhone15 Pro in range"),
+        ])
+
+    monkeypatch.setattr(server, "search", search)
+    monkeypatch.setattr(server, "_name_matches_terms", recording_name_matches_terms)
+
+    with caplog.at_level("DEBUG", logger="mercari_mcp"):
+        result = asyncio.run(call_tool(min_price=50000))
+
+    assert matched_names == ["iPhone15 Pro in range"]
+    assert result["names"] == ["iPhone15 Pro in range"]
+    assert caplog.records == []
+
+
+def test_in_range_item_with_bad_name_is_skipped_with_a_log(fake_search, monkeypatch, caplog):
+    def search(keyword, sort=None, order=None, status=None, exclude_keywords=""):
+        return iter([ItemWithBadName(price=100000)])
+
+    monkeypatch.setattr(server, "search", search)
+
+    with caplog.at_level("DEBUG", logger="mercari_mcp"):
+        result = asyncio.run(call_tool(min_price=50000))
+
+    assert result["names"] == []
+    assert "data access error" in caplog.text
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("iPhone15 Pro 256GB", ("iphone15", "pro", "256gb")),
+        ("iPhone15　Pro　　256GB", ("iphone15", "pro", "256gb")),
+        ("  ジャンク 　 ケース  ", ("ジャンク", "ケース")),
+        ("", ()),
+        ("　 \t", ()),
+    ],
+)
+def test_split_terms(text, expected):
+    assert server._split_terms(text) == expected
+
+
+def test_run_checks_reuses_one_session(fake_search):
+    fake = fake_search()
+
+    async def run():
+        client = await check_server.connect(server.mercari_mcp)
+        try:
+            return [await check_server.run_checks(client) for _ in range(2)]
+        finally:
+            await check_server.disconnect(client)
+
+    assert asyncio.run(run()) == [True, True]
+    assert len(fake.calls) == 1
+    assert check_server._open_sessions == {}